@@ -60,6 +60,7 @@ class StaticAnalyzerAndroid(models.Model):
     PLAYSTORE_DETAILS = models.TextField(default={})
     NETWORK_SECURITY = models.TextField(default=[])
     SECRETS = models.TextField(default=[])
+    VIRUS_TOTAL = models.JSONField(null=True, default=None)
 
 
 class StaticAnalyzerIOS(models.Model):
@@ -97,6 +98,7 @@ class StaticAnalyzerIOS(models.Model):
     FIREBASE_URLS = models.TextField(default=[])
     APPSTORE_DETAILS = models.TextField(default={})
     SECRETS = models.TextField(default=[])
+    VIRUS_TOTAL = models.JSONField(null=True, default=None)
 
 
 class StaticAnalyzerWindows(models.Model):
@@ -121,3 +123,11 @@ class StaticAnalyzerWindows(models.Model):
     STRINGS = models.TextField(default=[])
     BINARY_ANALYSIS = models.TextField(default=[])
     BINARY_WARNINGS = models.TextField(default=[])
+    VIRUS_TOTAL = models.JSONField(null=True, default=None)
+
+
+class AnalysisFileCache(models.Model):
+    SHA256 = models.CharField(max_length=64, default='', primary_key=True)
+    RULES_VERSION = models.CharField(max_length=10, default='')
+    RESULT = models.JSONField(default=dict)
+    LAST_USED = models.DateTimeField(default=datetime.now, db_index=True)
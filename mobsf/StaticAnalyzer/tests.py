@@ -3,12 +3,16 @@ import json
 import logging
 import os
 import platform
+import tempfile
+import zipfile
+from unittest.mock import patch
 
 from django.conf import settings
 from django.http import HttpResponse
 from django.test import Client, TestCase
 
 from mobsf.MobSF.utils import api_key
+from mobsf.StaticAnalyzer.views.shared_func import unzip
 
 logger = logging.getLogger(__name__)
 
@@ -423,3 +427,22 @@ class StaticAnalyzerAndAPI(TestCase):
     def test_rest_api(self):
         resp = self.http_client.post('/tests/?module=api')
         self.assertEqual(resp.status_code, 200)
+
+    def test_unzip_keeps_members_inside(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            app_path = os.path.join(tmp, 'test.zip')
+            ext_path = os.path.join(tmp, 'ext')
+            with zipfile.ZipFile(app_path, 'w') as zipptr:
+                zipptr.writestr('../x.txt', 'x')
+                zipptr.writestr('/abs.txt', 'abs')
+                zipptr.writestr('d/', '')
+                zipptr.writestr('d/f.txt', 'f')
+            # Force the zipfile extraction path
+            with patch('shutil.which', return_value=None):
+                files = unzip(app_path, ext_path)
+            self.assertEqual(sorted(files), ['abs.txt', 'd/', 'd/f.txt'])
+            for name in files:
+                self.assertTrue(
+                    os.path.exists(os.path.join(ext_path, name)))
+            self.assertEqual(
+                sorted(os.listdir(tmp)), ['ext', 'test.zip'])
@@ -8,7 +8,8 @@ from django.conf import settings
 
 from mobsf.MobSF.utils import filename_from_path
 from mobsf.StaticAnalyzer.views.shared_func import (
-    url_n_email_extract,
+    source_files,
+    url_n_email_extract_many,
 )
 from mobsf.StaticAnalyzer.views.sast_engine import (
     niap_scan,
@@ -27,9 +28,6 @@ def code_analysis(app_dir, typ, manifest_file):
         niap_rules = root / 'android' / 'rules' / 'android_niap.yaml'
         code_findings = {}
         api_findings = {}
-        email_n_file = []
-        url_n_file = []
-        url_list = []
         app_dir = Path(app_dir)
         if typ == 'apk':
             src = app_dir / 'java_source'
@@ -64,24 +62,8 @@ def code_analysis(app_dir, typ, manifest_file):
             manifest_file,
             None)
         # Extract URLs and Emails
-        for pfile in Path(src).rglob('*'):
-            if (
-                (pfile.suffix in ('.java', '.kt')
-                    and any(skip_path in pfile.as_posix()
-                            for skip_path in skp) is False)
-            ):
-                content = None
-                try:
-                    content = pfile.read_text('utf-8', 'ignore')
-                    # Certain file path cannot be read in windows
-                except Exception:
-                    continue
-                relative_java_path = pfile.as_posix().replace(src, '')
-                urls, urls_nf, emails_nf = url_n_email_extract(
-                    content, relative_java_path)
-                url_list.extend(urls)
-                url_n_file.extend(urls_nf)
-                email_n_file.extend(emails_nf)
+        url_list, url_n_file, email_n_file = url_n_email_extract_many(
+            source_files(src, ('.java', '.kt'), skp))
         logger.info('Finished Code Analysis, Email and URL Extraction')
         code_an_dic = {
             'api': api_findings,
@@ -8,7 +8,6 @@ import shutil
 from pathlib import Path
 
 import mobsf.MalwareAnalyzer.views.Trackers as Trackers
-import mobsf.MalwareAnalyzer.views.VirusTotal as VirusTotal
 from mobsf.MalwareAnalyzer.views.apkid import apkid_analysis
 from mobsf.MalwareAnalyzer.views.quark import quark_analysis
 from mobsf.MalwareAnalyzer.views.MalwareDomainCheck import MalwareDomainCheck
@@ -64,6 +63,7 @@ from mobsf.StaticAnalyzer.views.shared_func import (
     score,
     unzip,
     update_scan_timestamp,
+    virus_total_scan,
 )
 
 from androguard.core.bytecodes import apk
@@ -137,7 +137,8 @@ def static_analyzer(request, api=False):
                     app_dic['size'] = str(
                         file_size(app_dic['app_path'])) + 'MB'  # FILE SIZE
                     app_dic['sha1'], app_dic[
-                        'sha256'] = hash_gen(app_dic['app_path'])
+                        'sha256'] = hash_gen(
+                            app_dic['app_path'], want_sha1=True)
                     app_dic['files'] = unzip(
                         app_dic['app_path'], app_dic['app_dir'])
                     logger.info('APK Extracted')
@@ -308,8 +309,8 @@ def static_analyzer(request, api=False):
 
                 context['virus_total'] = None
                 if settings.VT_ENABLED:
-                    vt = VirusTotal.VirusTotal()
-                    context['virus_total'] = vt.get_result(
+                    context['virus_total'] = virus_total_scan(
+                        StaticAnalyzerAndroid,
                         app_dic['app_path'],
                         app_dic['md5'])
                 template = 'static_analysis/android_binary_analysis.html'
@@ -372,7 +373,8 @@ def static_analyzer(request, api=False):
                         app_dic['size'] = str(
                             file_size(app_dic['app_path'])) + 'MB'  # FILE SIZE
                         app_dic['sha1'], app_dic[
-                            'sha256'] = hash_gen(app_dic['app_path'])
+                            'sha256'] = hash_gen(
+                                app_dic['app_path'], want_sha1=True)
 
                         # Manifest XML
                         mani_file, mani_xml = get_manifest(
@@ -8,7 +8,8 @@ from mobsf.MalwareAnalyzer.views.MalwareDomainCheck import (
     MalwareDomainCheck,
 )
 from mobsf.StaticAnalyzer.views.shared_func import (
-    url_n_email_extract,
+    source_files,
+    url_n_email_extract_many,
 )
 from mobsf.StaticAnalyzer.views.sast_engine import scan
 
@@ -32,9 +33,6 @@ def ios_source_analysis(src):
         api_rules = root / 'ios' / 'rules' / 'ios_apis.yaml'
         code_findings = {}
         api_findings = {}
-        email_n_file = []
-        url_n_file = []
-        url_list = []
         domains = {}
         source_type = ''
         source_types = set()
@@ -61,20 +59,9 @@ def ios_source_analysis(src):
             settings.SKIP_CLASS_PATH)
 
         # Extract URLs and Emails
-        skp = settings.SKIP_CLASS_PATH
-        for pfile in Path(src).rglob('*'):
-            if (
-                (pfile.suffix in ('.m', '.swift')
-                    and any(skip_path in pfile.as_posix()
-                            for skip_path in skp) is False
-                    and pfile.is_dir() is False)
-            ):
-                relative_java_path = pfile.as_posix().replace(src, '')
-                urls, urls_nf, emails_nf = url_n_email_extract(
-                    pfile.read_text('utf-8', 'ignore'), relative_java_path)
-                url_list.extend(urls)
-                url_n_file.extend(urls_nf)
-                email_n_file.extend(emails_nf)
+        url_list, url_n_file, email_n_file = url_n_email_extract_many(
+            source_files(
+                src, ('.m', '.swift'), settings.SKIP_CLASS_PATH))
 
         if not source_types:
             source_type = _SourceType.nocode.value
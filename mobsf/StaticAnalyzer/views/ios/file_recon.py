@@ -5,46 +5,45 @@ from mobsf.MalwareAnalyzer.views.MalwareDomainCheck import (
     MalwareDomainCheck,
 )
 from mobsf.StaticAnalyzer.views.shared_func import (
-    url_n_email_extract,
+    url_n_email_extract_many,
 )
 
 logger = logging.getLogger(__name__)
 
 
+def read_files(src, all_files):
+    """Yield (relative path, content) of files to scan."""
+    for file in all_files:
+        if isinstance(file, dict):
+            relative_src_path = file['name']
+            dat = '\n'.join(file['data'])
+        # Skip CodeResources and contents under Frameworks
+        elif 'CodeResources' in file or '/Frameworks/' in file:
+            continue
+        elif file.endswith(('.nib', '.ttf', '.svg', '.woff2',
+                            '.png', '.dylib', '.mobileprovision',
+                            'Assets.car')):
+            continue
+        else:
+            dat = ''
+            relative_src_path = file.replace(src, '')
+            with io.open(file,
+                         mode='r',
+                         encoding='utf8',
+                         errors='ignore') as flip:
+                dat = flip.read()
+        yield relative_src_path, dat
+
+
 def extract_urls_n_email(src, all_files, strings):
     """IPA URL and Email Extraction."""
     try:
         logger.info('Starting IPA URL and Email Extraction')
-        email_n_file = []
-        url_n_file = []
-        url_list = []
         domains = {}
         all_files.append({'data': strings, 'name': 'IPA Strings Dump'})
-        for file in all_files:
-            if isinstance(file, dict):
-                relative_src_path = file['name']
-                dat = '\n'.join(file['data'])
-            # Skip CodeResources and contents under Frameworks
-            elif 'CodeResources' in file or '/Frameworks/' in file:
-                continue
-            elif file.endswith(('.nib', '.ttf', '.svg', '.woff2',
-                                '.png', '.dylib', '.mobileprovision',
-                                'Assets.car')):
-                continue
-            else:
-                dat = ''
-                relative_src_path = file.replace(src, '')
-                with io.open(file,
-                             mode='r',
-                             encoding='utf8',
-                             errors='ignore') as flip:
-                    dat = flip.read()
-            # Extract URLs and Emails from Plists
-            urls, urls_nf, emails_nf = url_n_email_extract(
-                dat, relative_src_path)
-            url_list.extend(urls)
-            url_n_file.extend(urls_nf)
-            email_n_file.extend(emails_nf)
+        # Extract URLs and Emails from Plists
+        url_list, url_n_file, email_n_file = url_n_email_extract_many(
+            read_files(src, all_files))
         # Unique URLs
         urls_list = list(set(url_list))
         # Domain Extraction and Malware Check
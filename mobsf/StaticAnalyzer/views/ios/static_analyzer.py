@@ -4,8 +4,6 @@ import logging
 import re
 from pathlib import Path
 
-import mobsf.MalwareAnalyzer.views.VirusTotal as VirusTotal
-
 from django.conf import settings
 from django.shortcuts import render
 
@@ -35,6 +33,7 @@ from mobsf.StaticAnalyzer.views.shared_func import (
     firebase_analysis,
     hash_gen, score, unzip,
     update_scan_timestamp,
+    virus_total_scan,
 )
 
 logger = logging.getLogger(__name__)
@@ -90,7 +89,8 @@ def static_analyzer_ios(request, api=False):
                     app_dict['size'] = str(
                         file_size(app_dict['app_path'])) + 'MB'  # FILE SIZE
                     app_dict['sha1'], app_dict['sha256'] = hash_gen(
-                        app_dict['app_path'])  # SHA1 & SHA256 HASHES
+                        app_dict['app_path'],
+                        want_sha1=True)  # SHA1 & SHA256 HASHES
                     logger.info('Extracting IPA')
                     # EXTRACT IPA
                     unzip(app_dict['app_path'], app_dict['app_dir'])
@@ -172,8 +172,8 @@ def static_analyzer_ios(request, api=False):
                         all_files)
                 context['virus_total'] = None
                 if settings.VT_ENABLED:
-                    vt = VirusTotal.VirusTotal()
-                    context['virus_total'] = vt.get_result(
+                    context['virus_total'] = virus_total_scan(
+                        StaticAnalyzerIOS,
                         app_dict['app_path'],
                         app_dict['md5_hash'])
                 context['average_cvss'], context[
@@ -199,7 +199,8 @@ def static_analyzer_ios(request, api=False):
                     app_dict['size'] = str(
                         file_size(app_dict['app_path'])) + 'MB'  # FILE SIZE
                     app_dict['sha1'], app_dict['sha256'] = hash_gen(
-                        app_dict['app_path'])  # SHA1 & SHA256 HASHES
+                        app_dict['app_path'],
+                        want_sha1=True)  # SHA1 & SHA256 HASHES
                     all_files = ios_list_files(
                         app_dict['app_dir'],
                         app_dict['md5_hash'],
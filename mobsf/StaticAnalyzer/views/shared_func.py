@@ -5,20 +5,27 @@ Shared Functions.
 Module providing the shared functions for static analysis of iOS and Android
 """
 import hashlib
-import io
 import json
 import logging
+import mmap
 import os
 import platform
 import re
 import shutil
 import subprocess
+import threading
 import zipfile
+from bisect import bisect_right
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import accumulate
 from urllib.parse import urlparse
 from pathlib import Path
 
 import requests
 
+from django.db import connection
 from django.http import HttpResponse
 from django.template.loader import get_template
 from django.utils import timezone
@@ -32,6 +39,7 @@ from mobsf.MobSF.utils import (
     upstream_proxy,
 )
 from mobsf.StaticAnalyzer.models import (
+    AnalysisFileCache,
     RecentScansDB,
     StaticAnalyzerAndroid,
     StaticAnalyzerIOS,
@@ -54,61 +62,184 @@ except ImportError:
         ' PDF Report Generation is disabled')
 logger = logging.getLogger(__name__)
 ctype = 'application/json; charset=utf-8'
-
-
-def hash_gen(app_path) -> tuple:
-    """Generate and return sha1 and sha256 as a tuple."""
+UNZIP_BUFSIZE = 1 << 20
+# Extract archives above this compressed size on multiple threads
+UNZIP_PARALLEL_SIZE = 16 << 20
+UNZIP_WORKERS = 4
+# Characters and files of source code scanned per regex pass
+EXTRACT_BATCH_SIZE = 8 << 20
+EXTRACT_BATCH_FILES = 500
+# Bump when URL_REGEX, EMAIL_REGEX or the cached result format change
+EXTRACT_RULES_VERSION = '2'
+# Least recently used cache entries above this limit are evicted
+EXTRACT_CACHE_MAX_ENTRIES = 100000
+# Seconds to wait on an open Firebase DB probe
+FIREBASE_TIMEOUT = 5
+# Keep-alive session shared by the Firebase DB probes
+FIREBASE_SESSION = requests.Session()
+# Checksums with a background VirusTotal fetch running or a queued upload
+VT_FETCHED = set()
+VT_FETCHED_LOCK = threading.Lock()
+# Bump when the PDF report templates change to invalidate cached reports
+PDF_REPORT_VERSION = '1'
+# wkhtmltopdf options for PDF reports
+PDF_OPTIONS = {
+    'page-size': 'Letter',
+    'quiet': '',
+    'enable-local-file-access': '',
+    'no-collate': '',
+    'margin-top': '0.50in',
+    'margin-right': '0.50in',
+    'margin-bottom': '0.50in',
+    'margin-left': '0.50in',
+    'encoding': 'UTF-8',
+    'orientation': 'Landscape',
+    'custom-header': [
+        ('Accept-Encoding', 'gzip'),
+    ],
+    'no-outline': None,
+}
+# URLs Extraction My Custom regex
+URL_REGEX = re.compile(
+    (
+        r'((?:https?://|s?ftps?://|'
+        r'file://|javascript:|data:|www\d{0,3}[.])'
+        r'[\w().=/;,#:@?&~*+!$%\'{}-]+)'
+    ),
+    re.UNICODE)
+# Email Extraction Regex
+EMAIL_REGEX = re.compile(r'[\w.-]{1,20}@[\w-]{1,20}\.[\w]{2,10}')
+
+
+def hash_gen(app_path, want_sha1=False) -> tuple:
+    """Generate and return sha1 and sha256 as a tuple.
+
+    SHA1 is only computed when want_sha1 is set, otherwise
+    an empty string is returned in its place.
+    """
     try:
         logger.info('Generating Hashes')
-        sha1 = hashlib.sha1()
-        sha256 = hashlib.sha256()
-        block_size = 65536
-        with io.open(app_path, mode='rb') as afile:
-            buf = afile.read(block_size)
-            while buf:
-                sha1.update(buf)
-                sha256.update(buf)
-                buf = afile.read(block_size)
-        sha1val = sha1.hexdigest()
-        sha256val = sha256.hexdigest()
+        sha1val = ''
+        with open(app_path, 'rb') as afile:
+            if not os.fstat(afile.fileno()).st_size:
+                # mmap cannot map an empty file
+                if want_sha1:
+                    sha1val = hashlib.sha1().hexdigest()
+                return sha1val, hashlib.sha256().hexdigest()
+            with mmap.mmap(afile.fileno(), 0,
+                           access=mmap.ACCESS_READ) as mview:
+                if not want_sha1:
+                    return sha1val, hashlib.sha256(mview).hexdigest()
+                # hashlib releases the GIL on large buffers,
+                # so both digests can run in parallel
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    sha1 = executor.submit(hashlib.sha1, mview)
+                    sha256 = executor.submit(hashlib.sha256, mview)
+                    sha1val = sha1.result().hexdigest()
+                    sha256val = sha256.result().hexdigest()
         return sha1val, sha256val
     except Exception:
         logger.exception('Generating Hashes')
 
 
+def _zip_member_name(zinfo):
+    """Return the zip member name, fixing up mis-decoded UTF-8 names."""
+    if zinfo.flag_bits & 0x800:
+        # UTF-8 flag is set, zipfile already decoded the name
+        return zinfo.filename
+    try:
+        # zipfile decodes names without the flag as cp437
+        return zinfo.filename.encode('cp437').decode('utf-8')
+    except UnicodeError:
+        return zinfo.filename
+
+
+def _member_path(ext_root, name):
+    """Return (relative name, extraction path) of a member.
+
+    Returns None if the member would be extracted outside of ext_root.
+    """
+    # Drop drive letters and leading slashes of absolute names
+    name = re.sub(r'^[A-Za-z]:', '', name).lstrip('/\\')
+    right_path = (ext_root / name).resolve()
+    if right_path != ext_root and ext_root not in right_path.parents:
+        logger.warning('Skipping zip member outside of %s: %s',
+                       ext_root, name)
+        return None
+    return name, right_path
+
+
+def _extract_members(app_path, members):
+    """Extract zip members using a ZipFile handle of its own."""
+    with zipfile.ZipFile(app_path, 'r') as zipptr:
+        for zinfo, right_path in members:
+            if zinfo.is_dir():
+                right_path.mkdir(parents=True, exist_ok=True)
+                continue
+            right_path.parent.mkdir(parents=True, exist_ok=True)
+            if not zinfo.file_size:
+                # Nothing to decompress for empty files
+                right_path.touch()
+                continue
+            # Size the copy buffer to the member, capped at 1 MiB
+            bufsize = min(zinfo.file_size, UNZIP_BUFSIZE)
+            with zipptr.open(zinfo) as src, \
+                    open(right_path, 'wb', UNZIP_BUFSIZE) as dst:
+                shutil.copyfileobj(src, dst, bufsize)
+
+
+def os_unzip(unzip_b, app_path, ext_path):
+    """Extract with the OS unzip utility and return the file list."""
+    proc = subprocess.run(
+        [unzip_b, '-o', '-q', app_path, '-d', ext_path])
+    # Exit code 1 only signals warnings, extraction still completed
+    if proc.returncode not in (0, 1):
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    dat = subprocess.check_output([unzip_b, '-Z1', app_path])
+    return dat.decode('utf-8', 'ignore').splitlines()
+
+
 def unzip(app_path, ext_path):
     logger.info('Unzipping')
+    unzip_b = shutil.which('unzip')
+    if platform.system() != 'Windows' and unzip_b:
+        try:
+            logger.info('Using the Default OS Unzip Utility.')
+            return os_unzip(unzip_b, app_path, ext_path)
+        except Exception:
+            logger.exception('Unzipping Error')
     try:
-        files = []
         with zipfile.ZipFile(app_path, 'r') as zipptr:
-            for filename in zipptr.namelist():
-                right_fn = filename.encode('cp437').decode('utf-8')
-                right_path = ext_path + "/" + right_fn
-                if right_fn.endswith("/"):
-                    Path(right_path).mkdir(parents=True, exist_ok=True)
-                else:
-                    # copy file
-                    with open(right_path, 'wb') as dst, zipptr.open(filename, 'r') as src:
-                        shutil.copyfileobj(src, dst)
-                files.append(right_fn)
+            zinfos = zipptr.infolist()
+        ext_root = Path(ext_path).resolve()
+        files = []
+        members = []
+        for zinfo in zinfos:
+            member = _member_path(ext_root, _zip_member_name(zinfo))
+            if member:
+                name, right_path = member
+                files.append(name)
+                members.append((zinfo, right_path))
+        # Keep the last of duplicate entries, so no two workers
+        # write the same file
+        members = list(dict(
+            (right_path, (zinfo, right_path))
+            for zinfo, right_path in members).values())
+        workers = 1
+        if sum(z.compress_size for z, _ in members) >= UNZIP_PARALLEL_SIZE:
+            workers = min(os.cpu_count() or 1, UNZIP_WORKERS)
+        if workers > 1:
+            # zlib releases the GIL while inflating, so members
+            # extracted on separate threads decompress in parallel
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(
+                    partial(_extract_members, app_path),
+                    [members[i::workers] for i in range(workers)]))
+        else:
+            _extract_members(app_path, members)
         return files
     except Exception:
         logger.exception('Unzipping Error')
-        if platform.system() == 'Windows':
-            logger.info('Not yet Implemented.')
-        else:
-            logger.info('Using the Default OS Unzip Utility.')
-            try:
-                unzip_b = shutil.which('unzip')
-                subprocess.call(
-                    [unzip_b, '-o', '-q', app_path, '-d', ext_path])
-                dat = subprocess.check_output([unzip_b, '-qq', '-l', app_path])
-                dat = dat.decode('utf-8').split('\n')
-                files_det = ['Length   Date   Time   Name']
-                files_det = files_det + dat
-                return files_det
-            except Exception:
-                logger.exception('Unzipping Error')
 
 
 def pdf(request, api=False, jsonres=False):
@@ -117,8 +248,7 @@ def pdf(request, api=False, jsonres=False):
             checksum = request.POST['hash']
         else:
             checksum = request.GET['md5']
-        hash_match = re.match('^[0-9a-f]{32}$', checksum)
-        if not hash_match:
+        if not is_md5(checksum):
             if api:
                 return {'error': 'Invalid scan hash'}
             else:
@@ -126,20 +256,20 @@ def pdf(request, api=False, jsonres=False):
                     json.dumps({'md5': 'Invalid scan hash'}),
                     content_type=ctype, status=500)
         # Do Lookups
-        android_static_db = StaticAnalyzerAndroid.objects.filter(
-            MD5=checksum)
-        ios_static_db = StaticAnalyzerIOS.objects.filter(
-            MD5=checksum)
-        win_static_db = StaticAnalyzerWindows.objects.filter(
-            MD5=checksum)
-
-        if android_static_db.exists():
-            context, template = handle_pdf_android(android_static_db)
-        elif ios_static_db.exists():
-            context, template = handle_pdf_ios(ios_static_db)
-        elif win_static_db.exists():
-            context, template = handle_pdf_win(win_static_db)
-        else:
+        scan = RecentScansDB.objects.filter(
+            MD5=checksum).only('SCAN_TYPE', 'TIMESTAMP').first()
+        if scan and not (api and jsonres):
+            pdf_dat = read_cached_pdf(checksum, scan.TIMESTAMP)
+            if pdf_dat:
+                if api:
+                    return {'pdf_dat': pdf_dat}
+                return HttpResponse(pdf_dat,
+                                    content_type='application/pdf')
+        context, template, static_model = None, None, None
+        if scan:
+            context, template, static_model = get_pdf_context(
+                checksum, scan.SCAN_TYPE)
+        if not context:
             if api:
                 return {'report': 'Report not Found'}
             else:
@@ -147,16 +277,17 @@ def pdf(request, api=False, jsonres=False):
                     json.dumps({'report': 'Report not Found'}),
                     content_type=ctype,
                     status=500)
-        # Do VT Scan only on binaries
-        context['virus_total'] = None
+        # VT Scan results of binaries are stored during static analysis
         ext = os.path.splitext(context['file_name'].lower())[1]
-        if settings.VT_ENABLED and ext != '.zip':
+        vt_pending = (settings.VT_ENABLED
+                      and ext != '.zip'
+                      and not is_vt_report(context['virus_total']))
+        if vt_pending:
             app_bin = os.path.join(
                 settings.UPLD_DIR,
                 checksum + '/',
                 checksum + ext)
-            vt = VirusTotal.VirusTotal()
-            context['virus_total'] = vt.get_result(app_bin, checksum)
+            start_virus_total_fetch(static_model, app_bin, checksum)
         # Get Local Base URL
         proto = 'file://'
         host_os = 'nix'
@@ -166,34 +297,23 @@ def pdf(request, api=False, jsonres=False):
         context['base_url'] = proto + settings.BASE_DIR
         context['dwd_dir'] = proto + settings.DWD_DIR
         context['host_os'] = host_os
-        context['timestamp'] = RecentScansDB.objects.get(
-            MD5=checksum).TIMESTAMP
+        context['timestamp'] = scan.TIMESTAMP
         try:
             if api and jsonres:
                 return {'report_dat': context}
             else:
-                options = {
-                    'page-size': 'Letter',
-                    'quiet': '',
-                    'enable-local-file-access': '',
-                    'no-collate': '',
-                    'margin-top': '0.50in',
-                    'margin-right': '0.50in',
-                    'margin-bottom': '0.50in',
-                    'margin-left': '0.50in',
-                    'encoding': 'UTF-8',
-                    'orientation': 'Landscape',
-                    'custom-header': [
-                        ('Accept-Encoding', 'gzip'),
-                    ],
-                    'no-outline': None,
-                }
+                options = PDF_OPTIONS
                 # Added proxy support to wkhtmltopdf
                 proxies, _ = upstream_proxy('https')
                 if proxies['https']:
-                    options['proxy'] = proxies['https']
+                    options = dict(PDF_OPTIONS, proxy=proxies['https'])
                 html = template.render(context)
-                pdf_dat = pdfkit.from_string(html, False, options=options)
+                pdf_dat = pdfkit.from_string(
+                    html, False,
+                    options=options,
+                    configuration=pdf_configuration())
+                if not vt_pending:
+                    write_cached_pdf(checksum, pdf_dat)
                 if api:
                     return {'pdf_dat': pdf_dat}
                 return HttpResponse(pdf_dat,
@@ -222,6 +342,68 @@ def pdf(request, api=False, jsonres=False):
             return print_n_send_error_response(request, msg, False, exp)
 
 
+def pdf_cache_path(checksum):
+    return Path(settings.UPLD_DIR) / checksum / 'report_{}.pdf'.format(
+        PDF_REPORT_VERSION)
+
+
+def read_cached_pdf(checksum, scan_time):
+    """Return the cached PDF report if it is newer than the scan."""
+    try:
+        cache_path = pdf_cache_path(checksum)
+        if (not cache_path.exists()
+                or cache_path.stat().st_mtime < scan_time.timestamp()):
+            return None
+        logger.info('Serving cached PDF Report')
+        return cache_path.read_bytes()
+    except Exception:
+        logger.exception('Reading cached PDF Report')
+    return None
+
+
+def write_cached_pdf(checksum, pdf_dat):
+    try:
+        pdf_cache_path(checksum).write_bytes(pdf_dat)
+    except Exception:
+        logger.exception('Caching PDF Report')
+
+
+def remove_cached_pdfs(checksum):
+    """Remove cached PDF reports of every report version."""
+    try:
+        for cache_path in (Path(settings.UPLD_DIR) / checksum).glob(
+                'report_*.pdf'):
+            cache_path.unlink()
+    except Exception:
+        logger.exception('Removing cached PDF Report')
+
+
+@lru_cache(maxsize=None)
+def pdf_configuration():
+    """Locate wkhtmltopdf once instead of on every PDF request."""
+    return pdfkit.configuration()
+
+
+def get_pdf_context(checksum, scan_type):
+    """Fetch the report context from the table for the scan type."""
+    # Source zips can be either Android or iOS projects
+    handlers = []
+    if scan_type in ('apk', 'xapk', 'apks', 'zip'):
+        handlers.append((StaticAnalyzerAndroid, handle_pdf_android))
+    if scan_type in ('ipa', 'zip'):
+        handlers.append((StaticAnalyzerIOS, handle_pdf_ios))
+    if scan_type == 'appx':
+        handlers.append((StaticAnalyzerWindows, handle_pdf_win))
+    for static_model, handler in handlers:
+        static_db = static_model.objects.filter(MD5=checksum)
+        # Evaluate the QuerySet once, the handlers index it repeatedly
+        if static_db:
+            context, template = handler(static_db)
+            context['virus_total'] = static_db[0].VIRUS_TOTAL
+            return context, template, static_model
+    return None, None, None
+
+
 def handle_pdf_android(static_db):
     logger.info(
         'Fetching data from DB for '
@@ -272,40 +454,175 @@ def handle_pdf_win(static_db):
 
 def url_n_email_extract(dat, relative_path):
     """Extract URLs and Emails from Source Code."""
-    urls = []
-    emails = []
-    urllist = []
     url_n_file = []
     email_n_file = []
-    # URLs Extraction My Custom regex
-    pattern = re.compile(
-        (
-            r'((?:https?://|s?ftps?://|'
-            r'file://|javascript:|data:|www\d{0,3}[.])'
-            r'[\w().=/;,#:@?&~*+!$%\'{}-]+)'
-        ),
-        re.UNICODE)
-    urllist = re.findall(pattern, dat)
-    uflag = 0
-    for url in urllist:
-        if url not in urls:
-            urls.append(url)
-            uflag = 1
-    if uflag == 1:
+    res = _extract_batch([dat])[0]
+    if res['urls']:
         url_n_file.append(
-            {'urls': urls, 'path': escape(relative_path)})
-
-    # Email Extraction Regex
-    regex = re.compile(r'[\w.-]{1,20}@[\w-]{1,20}\.[\w]{2,10}')
-    eflag = 0
-    for email in regex.findall(dat.lower()):
-        if (email not in emails) and (not email.startswith('//')):
-            emails.append(email)
-            eflag = 1
-    if eflag == 1:
+            {'urls': res['urls'], 'path': escape(relative_path)})
+    if res['emails']:
         email_n_file.append(
-            {'emails': emails, 'path': escape(relative_path)})
-    return urllist, url_n_file, email_n_file
+            {'emails': res['emails'], 'path': escape(relative_path)})
+    return res['urllist'], url_n_file, email_n_file
+
+
+def source_files(src, suffixes, skp):
+    """Yield (relative path, content) of source files under src."""
+    for pfile in Path(src).rglob('*'):
+        if (
+            (pfile.suffix in suffixes
+                and any(skip_path in pfile.as_posix()
+                        for skip_path in skp) is False
+                and pfile.is_dir() is False)
+        ):
+            try:
+                content = pfile.read_text('utf-8', 'ignore')
+                # Certain file path cannot be read in windows
+            except Exception:
+                continue
+            yield pfile.as_posix().replace(src, ''), content
+
+
+def _scan_batch(regex, contents):
+    """Run regex once over NUL joined contents.
+
+    Yields (index of the originating content, match).
+    """
+    # Neither pattern matches NUL, so no match spans two files
+    offsets = list(accumulate(len(c) + 1 for c in contents))
+    for match in regex.finditer('\0'.join(contents)):
+        yield bisect_right(offsets, match.start()), match.group()
+
+
+def _extract_batch(contents):
+    """Extract URLs and Emails from each of the contents."""
+    results = [
+        {'urllist': [], 'urls': {}, 'emails': {}} for _ in contents]
+    for idx, url in _scan_batch(URL_REGEX, contents):
+        results[idx]['urllist'].append(url)
+        results[idx]['urls'][url] = None
+    # Lower per file, lower() can change the length of a string
+    lowered = [content.lower() for content in contents]
+    for idx, email in _scan_batch(EMAIL_REGEX, lowered):
+        if not email.startswith('//'):
+            results[idx]['emails'][email] = None
+    for res in results:
+        res['urls'] = list(res['urls'])
+        res['emails'] = list(res['emails'])
+    return results
+
+
+def _pack_extract_result(res):
+    """Return the cached form of a result, without empty lists."""
+    return {key: res[key] for key in ('urllist', 'emails') if res[key]}
+
+
+def _unpack_extract_result(stored):
+    """Rebuild a result from its cached form."""
+    urllist = stored.get('urllist', [])
+    return {
+        'urllist': urllist,
+        'urls': list(dict.fromkeys(urllist)),
+        'emails': stored.get('emails', []),
+    }
+
+
+def _cached_extract_batch(contents):
+    """Extract URLs and Emails, reusing results cached by SHA256."""
+    hashes = [
+        hashlib.sha256(content.encode('utf-8', 'surrogatepass')).hexdigest()
+        for content in contents]
+    try:
+        cached = {
+            sha256: _unpack_extract_result(stored)
+            for sha256, stored in AnalysisFileCache.objects.filter(
+                SHA256__in=set(hashes),
+                RULES_VERSION=EXTRACT_RULES_VERSION,
+            ).values_list('SHA256', 'RESULT')}
+    except Exception:
+        logger.exception('Reading URL and Email extraction cache')
+        cached = {}
+    misses = {}
+    for sha256, content in zip(hashes, contents):
+        if sha256 not in cached:
+            misses[sha256] = content
+    if misses:
+        cached.update(zip(misses, _extract_batch(list(misses.values()))))
+    try:
+        _update_extract_cache(cached, misses)
+    except Exception:
+        logger.exception('Updating URL and Email extraction cache')
+    return [cached[sha256] for sha256 in hashes]
+
+
+def _update_extract_cache(results, misses):
+    now = timezone.now()
+    hits = [sha256 for sha256 in results if sha256 not in misses]
+    AnalysisFileCache.objects.filter(SHA256__in=hits).update(LAST_USED=now)
+    if not misses:
+        return
+    # Drop entries from older rules before inserting the new results
+    AnalysisFileCache.objects.filter(SHA256__in=list(misses)).delete()
+    AnalysisFileCache.objects.bulk_create([
+        AnalysisFileCache(
+            SHA256=sha256,
+            RULES_VERSION=EXTRACT_RULES_VERSION,
+            RESULT=_pack_extract_result(results[sha256]),
+            LAST_USED=now)
+        for sha256 in misses], ignore_conflicts=True)
+
+
+def _evict_extract_cache():
+    """Drop least recently used entries above the cache limit."""
+    stale = list(AnalysisFileCache.objects.order_by(
+        '-LAST_USED').values_list('SHA256', flat=True)[
+            EXTRACT_CACHE_MAX_ENTRIES:])
+    # Delete in chunks to stay below the bound parameter limit
+    for i in range(0, len(stale), EXTRACT_BATCH_FILES):
+        AnalysisFileCache.objects.filter(
+            SHA256__in=stale[i:i + EXTRACT_BATCH_FILES]).delete()
+
+
+def _extract_files(batch, result):
+    urllist, url_n_file, email_n_file = result
+    contents = [content for _, content in batch]
+    for (relative_path, _), res in zip(
+            batch, _cached_extract_batch(contents)):
+        urllist.extend(res['urllist'])
+        if res['urls']:
+            url_n_file.append(
+                {'urls': res['urls'], 'path': escape(relative_path)})
+        if res['emails']:
+            email_n_file.append(
+                {'emails': res['emails'], 'path': escape(relative_path)})
+
+
+def url_n_email_extract_many(file_contents):
+    """Extract URLs and Emails from many Source Code files.
+
+    Takes an iterable of (relative_path, content) pairs and scans them
+    in batches with one regex pass per batch. Results are cached by
+    SHA256 of the content so unchanged files are not rescanned. Returns
+    the same tuple as url_n_email_extract, aggregated across all files.
+    """
+    result = ([], [], [])
+    batch = []
+    batch_size = 0
+    for relative_path, content in file_contents:
+        batch.append((relative_path, content))
+        batch_size += len(content)
+        if (batch_size >= EXTRACT_BATCH_SIZE
+                or len(batch) >= EXTRACT_BATCH_FILES):
+            _extract_files(batch, result)
+            batch = []
+            batch_size = 0
+    if batch:
+        _extract_files(batch, result)
+    try:
+        _evict_extract_cache()
+    except Exception:
+        logger.exception('Evicting URL and Email extraction cache')
+    return result
 
 
 # This is just the first sanity check that triggers generic_compare
@@ -324,23 +641,15 @@ def compare_apps(request, hash1: str, hash2: str, api=False):
 
 def score(findings):
     # Score Apps based on AVG CVSS Score
-    cvss_scores = []
     avg_cvss = 0
-    app_score = 100
-    for finding in findings.values():
-        find = finding.get('metadata')
-        if not find:
-            # Hack to support iOS Binary Scan Results
-            find = finding
-        if find.get('cvss'):
-            if find['cvss'] != 0:
-                cvss_scores.append(find['cvss'])
-        if find['severity'] == 'high':
-            app_score = app_score - 15
-        elif find['severity'] == 'warning':
-            app_score = app_score - 10
-        elif find['severity'] == 'good':
-            app_score = app_score + 5
+    # Hack to support iOS Binary Scan Results
+    metadata = [f.get('metadata') or f for f in findings.values()]
+    cvss_scores = [find['cvss'] for find in metadata if find.get('cvss')]
+    severity = Counter(find['severity'] for find in metadata)
+    app_score = (100
+                 - 15 * severity['high']
+                 - 10 * severity['warning']
+                 + 5 * severity['good'])
     if cvss_scores:
         avg_cvss = round(sum(cvss_scores) / len(cvss_scores), 1)
     if app_score < 0:
@@ -350,26 +659,117 @@ def score(findings):
     return avg_cvss, app_score
 
 
+def is_vt_report(result):
+    """Check if a VirusTotal result is a finished scan report."""
+    # Upload acks also have response_code 1 but no scans
+    return (bool(result) and result.get('response_code') == 1
+            and 'scans' in result)
+
+
+def _vt_upload_queued(result):
+    """Check if a VirusTotal result is an upload ack."""
+    return (bool(result) and result.get('response_code') == 1
+            and 'scans' not in result)
+
+
+def _same_vt_report(old, new):
+    """Check if two VirusTotal reports are of the same scan."""
+    if not is_vt_report(old):
+        return False
+    if new.get('scan_id'):
+        return (old.get('scan_id'), old.get('scan_date')) == (
+            new.get('scan_id'), new.get('scan_date'))
+    return old == new
+
+
+def virus_total_scan(static_model, app_path, checksum):
+    """Get VirusTotal result and store it with the static analysis."""
+    vt = VirusTotal.VirusTotal()
+    result = vt.get_result(app_path, checksum)
+    # Upload acks, skipped scans and errors are not stored
+    if not is_vt_report(result):
+        return result
+    static_db = static_model.objects.filter(MD5=checksum)
+    stored = static_db.values_list('VIRUS_TOTAL', flat=True).first()
+    if not _same_vt_report(stored, result):
+        static_db.update(VIRUS_TOTAL=result)
+        # Cached PDF reports do not include the new result
+        remove_cached_pdfs(checksum)
+    return result
+
+
+def _background_virus_total_scan(static_model, app_path, checksum):
+    result = None
+    try:
+        result = virus_total_scan(static_model, app_path, checksum)
+    except Exception:
+        logger.exception('VirusTotal background scan')
+    finally:
+        # Keep the checksum only if the file was uploaded,
+        # so failed fetches are retried but never re-uploaded
+        if not _vt_upload_queued(result):
+            with VT_FETCHED_LOCK:
+                VT_FETCHED.discard(checksum)
+        connection.close()
+
+
+def start_virus_total_fetch(static_model, app_path, checksum):
+    """Fetch VirusTotal result in the background, once per checksum."""
+    with VT_FETCHED_LOCK:
+        if checksum in VT_FETCHED:
+            return
+        VT_FETCHED.add(checksum)
+    threading.Thread(
+        target=_background_virus_total_scan,
+        args=(static_model, app_path, checksum),
+        daemon=True).start()
+
+
 def update_scan_timestamp(scan_hash):
     # Update the last scan time.
     tms = timezone.now()
     RecentScansDB.objects.filter(MD5=scan_hash).update(TIMESTAMP=tms)
 
 
-def open_firebase(url):
-    # Detect Open Firebase Database
+def _probe_firebase_host(scheme, netloc):
+    """Check if the Firebase DB at scheme://netloc is open."""
     try:
-        purl = urlparse(url)
-        base_url = '{}://{}/.json'.format(purl.scheme, purl.netloc)
+        base_url = '{}://{}/.json'.format(scheme, netloc)
         proxies, verify = upstream_proxy('https')
         headers = {
             'User-Agent': ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1)'
                            ' AppleWebKit/537.36 (KHTML, like Gecko) '
                            'Chrome/39.0.2171.95 Safari/537.36')}
-        resp = requests.get(base_url, headers=headers,
-                            proxies=proxies, verify=verify)
-        if resp.status_code == 200:
-            return base_url, True
+        # HEAD avoids downloading the whole database
+        resp = FIREBASE_SESSION.head(base_url, headers=headers,
+                                     proxies=proxies, verify=verify,
+                                     timeout=FIREBASE_TIMEOUT,
+                                     allow_redirects=True)
+        if resp.status_code not in (405, 501):
+            return resp.status_code == 200
+        # HEAD is rejected, GET a single byte without reading the body
+        headers['Range'] = 'bytes=0-0'
+        with FIREBASE_SESSION.get(base_url, headers=headers,
+                                  proxies=proxies, verify=verify,
+                                  timeout=FIREBASE_TIMEOUT,
+                                  stream=True) as resp:
+            return resp.status_code in (200, 206)
+    except Exception:
+        logger.warning('Open Firebase DB detection failed.')
+    return False
+
+
+def open_firebase(url, probes=None):
+    # Detect Open Firebase Database
+    try:
+        purl = urlparse(url)
+        host = (purl.scheme, purl.netloc)
+        if probes and host in probes:
+            is_open = probes[host]
+        else:
+            is_open = _probe_firebase_host(*host)
+        if is_open:
+            return '{}://{}/.json'.format(purl.scheme, purl.netloc), True
     except Exception:
         logger.warning('Open Firebase DB detection failed.')
     return url, False
@@ -379,50 +779,73 @@ def firebase_analysis(urls):
     # Detect Firebase URL
     firebase_db = []
     logger.info('Detecting Firebase URL(s)')
-    for url in urls:
-        if 'firebaseio.com' in url:
-            returl, is_open = open_firebase(url)
-            fbdic = {'url': returl, 'open': is_open}
-            if fbdic not in firebase_db:
-                firebase_db.append(fbdic)
+    candidates = list(dict.fromkeys(
+        url for url in urls if 'firebaseio.com' in url))
+    hosts = set()
+    for url in candidates:
+        try:
+            purl = urlparse(url)
+            hosts.add((purl.scheme, purl.netloc))
+        except ValueError:
+            continue
+    hosts = list(hosts)
+    # Probe each host once, concurrently
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        probes = dict(zip(hosts, executor.map(
+            lambda host: _probe_firebase_host(*host), hosts)))
+    for url in candidates:
+        returl, is_open = open_firebase(url, probes)
+        fbdic = {'url': returl, 'open': is_open}
+        if fbdic not in firebase_db:
+            firebase_db.append(fbdic)
     return firebase_db
 
 
 def find_java_source_folder(base_folder: Path):
     # Find the correct java/kotlin source folder for APK/source zip
     # Returns a Tuple of - (SRC_PATH, SRC_TYPE, SRC_SYNTAX)
-    return next(p for p in [(base_folder / 'java_source',
-                             'java', '*.java'),
-                            (base_folder / 'app' / 'src' / 'main' / 'java',
-                             'java', '*.java'),
-                            (base_folder / 'app' / 'src' / 'main' / 'kotlin',
-                             'kotlin', '*.kt'),
-                            (base_folder / 'src',
-                             'java', '*.java')]
-                if p[0].exists())
+    # List the base folder once, stat nested paths only under app/
+    try:
+        with os.scandir(base_folder) as entries:
+            top = {entry.name for entry in entries}
+    except OSError:
+        top = set()
+    main = base_folder / 'app' / 'src' / 'main'
+    return next((path, src_type, syntax)
+                for top_dir, path, src_type, syntax in [
+                    ('java_source', base_folder / 'java_source',
+                     'java', '*.java'),
+                    ('app', main / 'java', 'java', '*.java'),
+                    ('app', main / 'kotlin', 'kotlin', '*.kt'),
+                    ('src', base_folder / 'src', 'java', '*.java')]
+                if top_dir in top
+                and (path.parent == base_folder or path.exists()))
+
+
+SECRET_IDENTIFIERS = (
+    'api"', 'key"', 'api_', 'key_', 'secret"',
+    'password"', 'aws', 'gcp', 's3_', '_s3', 'secret_',
+    'token"', 'username"', 'user_name"', 'user"',
+    'bearer', 'jwt', 'certificate"', 'credential',
+    'azure', 'webhook', 'twilio_', 'bitcoin',
+    '_auth', 'firebase', 'oauth', 'authorization',
+    'private', 'pwd', 'session', 'token_',
+)
+NOT_SECRET_STRINGS = (
+    'label_', 'text', 'hint', 'msg_', 'create_',
+    'message', 'new', 'confirm', 'activity_',
+    'forgot', 'dashboard_', 'current_', 'signup',
+    'sign_in', 'signin', 'title_', 'welcome_',
+    'change_', 'this_', 'the_', 'placeholder',
+    'invalid_', 'btn_', 'action_', 'prompt_',
+    'lable', 'hide_', 'old', 'update', 'error',
+    'empty', 'txt_', 'lbl_',
+)
 
 
 def is_secret(inp):
     """Check if captures string is a possible secret."""
     inp = inp.lower()
-    iden = (
-        'api"', 'key"', 'api_', 'key_', 'secret"',
-        'password"', 'aws', 'gcp', 's3_', '_s3', 'secret_',
-        'token"', 'username"', 'user_name"', 'user"',
-        'bearer', 'jwt', 'certificate"', 'credential',
-        'azure', 'webhook', 'twilio_', 'bitcoin',
-        '_auth', 'firebase', 'oauth', 'authorization',
-        'private', 'pwd', 'session', 'token_',
-    )
-    not_string = (
-        'label_', 'text', 'hint', 'msg_', 'create_',
-        'message', 'new', 'confirm', 'activity_',
-        'forgot', 'dashboard_', 'current_', 'signup',
-        'sign_in', 'signin', 'title_', 'welcome_',
-        'change_', 'this_', 'the_', 'placeholder',
-        'invalid_', 'btn_', 'action_', 'prompt_',
-        'lable', 'hide_', 'old', 'update', 'error',
-        'empty', 'txt_', 'lbl_',
-    )
-    not_str = any(i in inp for i in not_string)
-    return any(i in inp for i in iden) and not not_str
+    # Exclusions are only checked once an identifier matched
+    return (any(i in inp for i in SECRET_IDENTIFIERS)
+            and not any(i in inp for i in NOT_SECRET_STRINGS))
@@ -27,13 +27,13 @@ from mobsf.MobSF.utils import (
     get_config_loc,
     print_n_send_error_response,
 )
-import mobsf.MalwareAnalyzer.views.VirusTotal as VirusTotal
 from mobsf.StaticAnalyzer.models import StaticAnalyzerWindows
 from mobsf.StaticAnalyzer.tools.strings import strings_util
 from mobsf.StaticAnalyzer.views.shared_func import (
     hash_gen,
     unzip,
     update_scan_timestamp,
+    virus_total_scan,
 )
 from mobsf.StaticAnalyzer.views.windows.db_interaction import (
     get_context_from_analysis,
@@ -100,7 +100,8 @@ def staticanalyzer_windows(request, api=False):
                         file_size(app_dic['app_path'])) + 'MB'
                     # Generate hashes
                     app_dic['sha1'], app_dic[
-                        'sha256'] = hash_gen(app_dic['app_path'])
+                        'sha256'] = hash_gen(
+                            app_dic['app_path'], want_sha1=True)
                     # EXTRACT APPX
                     logger.info('Extracting APPX')
                     app_dic['files'] = unzip(
@@ -127,8 +128,8 @@ def staticanalyzer_windows(request, api=False):
                                                         bin_an_dic)
                 context['virus_total'] = None
                 if settings.VT_ENABLED:
-                    vt = VirusTotal.VirusTotal()
-                    context['virus_total'] = vt.get_result(
+                    context['virus_total'] = virus_total_scan(
+                        StaticAnalyzerWindows,
                         os.path.join(app_dic['app_dir'], app_dic[
                                      'md5']) + '.appx',
                         app_dic['md5'])